@@ -9,16 +9,16 @@ Coleta dados filtrados para:
 import os
 import logging
 from datetime import datetime
+from pathlib import Path
 from google.analytics.data_v1beta import BetaAnalyticsDataClient
 from google.analytics.data_v1beta.types import (
     DateRange, Dimension, Metric, RunReportRequest,
-    FilterExpression, Filter
+    FilterExpression, Filter, OrderBy, MetricAggregation
 )
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
-import pickle
-import pandas as pd
+import zipfile
 
 # ============================================================================
 # CONFIGURAÇÃO
@@ -31,7 +31,7 @@ class Config:
     
     # Autenticação
     CLIENT_SECRET_FILE = 'client_secret.json'
-    TOKEN_FILE = 'token.pickle'
+    TOKEN_FILE = 'token.json'
     SCOPES = ['https://www.googleapis.com/auth/analytics.readonly']
     
     # Período de análise - Ano 2025 completo
@@ -42,43 +42,67 @@ class Config:
     OUTPUT_DIR = 'ga4_reports'
     LOG_FILE = 'filtro_app_2025.log'
 
+# Nomes dos meses em português (a dimensão 'month' do GA4 vem como '01'..'12')
+_MONTH_NAMES = {
+    '01': 'janeiro', '02': 'fevereiro', '03': 'março',
+    '04': 'abril', '05': 'maio', '06': 'junho',
+    '07': 'julho', '08': 'agosto', '09': 'setembro',
+    '10': 'outubro', '11': 'novembro', '12': 'dezembro'
+}
+
 # ============================================================================
 # LOGGING
 # ============================================================================
 
 def setup_logging():
-    """Configura logging para arquivo e console"""
+    """Configura logging para arquivo e console (idempotente)"""
+    # Evita handlers duplicados quando outro módulo do pipeline já
+    # configurou o root logger no mesmo processo
+    if logging.getLogger().handlers:
+        return logging.getLogger(__name__)
+
     os.makedirs(Config.OUTPUT_DIR, exist_ok=True)
     log_path = os.path.join(Config.OUTPUT_DIR, Config.LOG_FILE)
-    
+
     logging.basicConfig(
         level=logging.INFO,
         format='%(asctime)s - %(levelname)s - %(message)s',
         handlers=[
-            logging.FileHandler(log_path, encoding='utf-8'),
+            # delay=True: o arquivo só é aberto na primeira mensagem
+            logging.FileHandler(log_path, encoding='utf-8', delay=True),
             logging.StreamHandler()
         ]
     )
     return logging.getLogger(__name__)
 
-logger = setup_logging()
+# A configuração dos handlers acontece uma única vez, em main()
+logger = logging.getLogger(__name__)
 
 # ============================================================================
 # AUTENTICAÇÃO
 # ============================================================================
 
+# Cliente único por processo: evita reler/despicklar o token e reaproveita
+# o mesmo canal gRPC entre chamadas repetidas
+_client_singleton = None
+
 def authenticate_ga4():
     """
     Autentica no Google Analytics 4
     Retorna um cliente autenticado
     """
+    global _client_singleton
+    if _client_singleton is not None:
+        return _client_singleton
+
     creds = None
-    
+
     # Verifica se já existe token salvo
     if os.path.exists(Config.TOKEN_FILE):
         logger.info("📂 Carregando credenciais salvas...")
-        with open(Config.TOKEN_FILE, 'rb') as token:
-            creds = pickle.load(token)
+        creds = Credentials.from_authorized_user_file(
+            Config.TOKEN_FILE, Config.SCOPES
+        )
     
     # Se não há credenciais válidas, faz login
     if not creds or not creds.valid:
@@ -92,11 +116,12 @@ def authenticate_ga4():
             creds = flow.run_local_server(port=0)
         
         # Salva as credenciais para próxima execução
-        with open(Config.TOKEN_FILE, 'wb') as token:
-            pickle.dump(creds, token)
+        with open(Config.TOKEN_FILE, 'w', encoding='utf-8') as token:
+            token.write(creds.to_json())
         logger.info("✅ Credenciais salvas com sucesso!")
     
-    return BetaAnalyticsDataClient(credentials=creds)
+    _client_singleton = BetaAnalyticsDataClient(credentials=creds)
+    return _client_singleton
 
 # ============================================================================
 # COLETA DE DADOS - APP (ANDROID E iOS)
@@ -120,30 +145,15 @@ def fetch_app_data_2025(client):
     logger.info("📱 Coletando dados do App (Android + iOS) - Ano 2025...")
     
     try:
-        # Configuração do filtro: platform = 'Android' OR platform = 'iOS'
+        # Configuração do filtro: platform IN ('Android', 'iOS')
         filter_expression = FilterExpression(
-            or_group={
-                'expressions': [
-                    FilterExpression(
-                        filter=Filter(
-                            field_name="platform",
-                            string_filter=Filter.StringFilter(
-                                match_type=Filter.StringFilter.MatchType.EXACT,
-                                value="Android"
-                            )
-                        )
-                    ),
-                    FilterExpression(
-                        filter=Filter(
-                            field_name="platform",
-                            string_filter=Filter.StringFilter(
-                                match_type=Filter.StringFilter.MatchType.EXACT,
-                                value="iOS"
-                            )
-                        )
-                    )
-                ]
-            }
+            filter=Filter(
+                field_name="platform",
+                in_list_filter=Filter.InListFilter(
+                    values=["Android", "iOS"],
+                    case_sensitive=True
+                )
+            )
         )
         
         # Requisição à API
@@ -159,46 +169,52 @@ def fetch_app_data_2025(client):
                 start_date=Config.ANALYSIS_START,
                 end_date=Config.ANALYSIS_END
             )],
-            dimension_filter=filter_expression
+            dimension_filter=filter_expression,
+            # A API já devolve as linhas ordenadas por mês ('01'..'12'),
+            # dispensando a reordenação no cliente
+            order_bys=[OrderBy(
+                dimension=OrderBy.DimensionOrderBy(dimension_name="month")
+            )],
+            # Totais do período calculados pela API (response.totals),
+            # dispensando a soma das linhas no cliente
+            metric_aggregations=[MetricAggregation.TOTAL]
         )
         
         response = client.run_report(request)
         
-        # Processa os dados
-        data = []
-        meses = {
-            '01': 'janeiro', '02': 'fevereiro', '03': 'março',
-            '04': 'abril', '05': 'maio', '06': 'junho',
-            '07': 'julho', '08': 'agosto', '09': 'setembro',
-            '10': 'outubro', '11': 'novembro', '12': 'dezembro'
-        }
-        
-        for row in response.rows:
+        # São no máximo 12 linhas: uma lista de dicts dispensa o custo de
+        # importar/construir DataFrame para este volume
+        rows = []
+        # Mensagem protobuf crua: lê os campos sem o wrapping por atributo
+        # do proto-plus, que copia valores a cada acesso no loop de parsing
+        pb = response._pb
+        for row in pb.rows:
             mes_num = row.dimension_values[0].value
-            mes_nome = meses.get(mes_num, mes_num)
-            
-            usuarios = int(row.metric_values[0].value)
-            sessoes = int(row.metric_values[1].value)
-            receita = float(row.metric_values[2].value)
-            
-            data.append({
-                'Mês': mes_nome,
+            parsed = {
+                'Mês': _MONTH_NAMES.get(mes_num, mes_num),
                 'Ano': '2025',
-                'App_Usuários_total': usuarios,
-                'App_Sessões_total': sessoes,
-                'App_Receita_total': receita
-            })
-            
-            logger.info(f"  ✓ {mes_nome}/2025: {usuarios:,} usuários | {sessoes:,} sessões | R$ {receita:,.2f}")
-        
-        # Ordena por mês
-        ordem_meses = list(meses.values())
-        df = pd.DataFrame(data)
-        df['ordem'] = df['Mês'].map({mes: i for i, mes in enumerate(ordem_meses)})
-        df = df.sort_values('ordem').drop('ordem', axis=1)
-        
-        logger.info(f"✅ Coletados dados de {len(df)} meses")
-        return df
+                'App_Usuários_total': int(row.metric_values[0].value),
+                'App_Sessões_total': int(row.metric_values[1].value),
+                'App_Receita_total': float(row.metric_values[2].value)
+            }
+            rows.append(parsed)
+            # Rastreio por linha só em DEBUG; args % não são formatados
+            # quando o nível suprime a mensagem
+            logger.debug(
+                "  ✓ %s/2025: %d usuários | %d sessões | R$ %.2f",
+                parsed['Mês'], parsed['App_Usuários_total'],
+                parsed['App_Sessões_total'], parsed['App_Receita_total']
+            )
+
+        totals = pb.totals[0].metric_values if pb.totals else None
+        logger.info(
+            "✅ Coletados dados de %d meses | %d usuários | %d sessões | R$ %.2f",
+            len(rows),
+            int(totals[0].value) if totals else 0,
+            int(totals[1].value) if totals else 0,
+            float(totals[2].value) if totals else 0.0
+        )
+        return rows
         
     except Exception as e:
         logger.error(f"❌ Erro ao coletar dados do App: {str(e)}")
@@ -208,37 +224,129 @@ def fetch_app_data_2025(client):
 # EXPORTAÇÃO
 # ============================================================================
 
-def export_to_excel(df):
-    """Exporta os dados para Excel"""
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+# Para a planilha fixa de 12x5 o overhead das bibliotecas de Excel (estilos,
+# bookkeeping do workbook, import) domina o tempo de exportação. As partes
+# canônicas do contêiner xlsx são emitidas diretamente como XML.
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+_XLSX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="App (Android + iOS)" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+# Estilo 1 = moeda R$ (numFmtId customizado 164)
+_XLSX_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="R$ #,##0.00"/></numFmts>'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border/></borders>'
+    '<cellStyleXfs count="1"><xf/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0"/><xf numFmtId="164" applyNumberFormat="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+_XLSX_SHEET_TEMPLATE = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<cols>'
+    '<col min="1" max="1" width="12" customWidth="1"/>'   # Mês
+    '<col min="2" max="2" width="8" customWidth="1"/>'    # Ano
+    '<col min="3" max="5" width="20" customWidth="1"/>'   # Usuários/Sessões/Receita
+    '</cols>'
+    '<sheetData>{rows}</sheetData>'
+    '</worksheet>'
+)
+
+_XLSX_HEADER = (
+    'Mês', 'Ano', 'App_Usuários_total', 'App_Sessões_total', 'App_Receita_total'
+)
+
+
+def _xml_escape(text):
+    """Escapa os caracteres reservados de XML"""
+    return str(text).replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def _inline_str_cell(ref, text):
+    """Célula de texto com string inline (dispensa shared strings)"""
+    return f'<c r="{ref}" t="inlineStr"><is><t>{_xml_escape(text)}</t></is></c>'
+
+
+def _number_cell(ref, value, style=0):
+    """Célula numérica; style=1 aplica o formato de moeda R$"""
+    style_attr = f' s="{style}"' if style else ''
+    return f'<c r="{ref}"{style_attr}><v>{value}</v></c>'
+
+
+def export_to_excel(rows, timestamp):
+    """Exporta as linhas coletadas escrevendo o XML do xlsx diretamente"""
     filename = f"App_Android_iOS_2025_{timestamp}.xlsx"
-    filepath = os.path.join(Config.OUTPUT_DIR, filename)
-    
+    filepath = Path(Config.OUTPUT_DIR) / filename
+
     logger.info(f"💾 Exportando para Excel: {filename}")
-    
+
     try:
-        with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='App (Android + iOS)', index=False)
-            
-            # Formata a planilha
-            worksheet = writer.sheets['App (Android + iOS)']
-            
-            # Ajusta largura das colunas
-            worksheet.column_dimensions['A'].width = 12  # Mês
-            worksheet.column_dimensions['B'].width = 8   # Ano
-            worksheet.column_dimensions['C'].width = 20  # Usuários
-            worksheet.column_dimensions['D'].width = 20  # Sessões
-            worksheet.column_dimensions['E'].width = 20  # Receita
-            
-            # Formata valores de receita como moeda
-            from openpyxl.styles import numbers
-            for row in range(2, len(df) + 2):
-                cell = worksheet[f'E{row}']
-                cell.number_format = 'R$ #,##0.00'
-        
+        header_cells = ''.join(
+            _inline_str_cell(f'{col}1', name)
+            for col, name in zip('ABCDE', _XLSX_HEADER)
+        )
+        xml_rows = [f'<row r="1">{header_cells}</row>']
+
+        for n, row in enumerate(rows, start=2):
+            cells = (
+                _inline_str_cell(f'A{n}', row['Mês'])
+                + _inline_str_cell(f'B{n}', row['Ano'])
+                + _number_cell(f'C{n}', row['App_Usuários_total'])
+                + _number_cell(f'D{n}', row['App_Sessões_total'])
+                + _number_cell(f'E{n}', row['App_Receita_total'], style=1)
+            )
+            xml_rows.append(f'<row r="{n}">{cells}</row>')
+
+        sheet_xml = _XLSX_SHEET_TEMPLATE.format(rows=''.join(xml_rows))
+
+        with zipfile.ZipFile(filepath, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr('[Content_Types].xml', _XLSX_CONTENT_TYPES)
+            zf.writestr('_rels/.rels', _XLSX_RELS)
+            zf.writestr('xl/workbook.xml', _XLSX_WORKBOOK)
+            zf.writestr('xl/_rels/workbook.xml.rels', _XLSX_WORKBOOK_RELS)
+            zf.writestr('xl/styles.xml', _XLSX_STYLES)
+            zf.writestr('xl/worksheets/sheet1.xml', sheet_xml)
+
         logger.info(f"✅ Arquivo salvo com sucesso: {filepath}")
         return filepath
-        
+
     except Exception as e:
         logger.error(f"❌ Erro ao exportar Excel: {str(e)}")
         raise
@@ -249,6 +357,8 @@ def export_to_excel(df):
 
 def main():
     """Função principal"""
+    setup_logging()
+
     logger.info("=" * 70)
     logger.info("🚀 INICIANDO COLETA DE DADOS - APP (ANDROID + iOS) - 2025")
     logger.info("=" * 70)
@@ -263,25 +373,26 @@ def main():
         logger.info("\n📋 ETAPA 2/3: Coleta de dados")
         logger.info(f"   Período: {Config.ANALYSIS_START} a {Config.ANALYSIS_END}")
         logger.info(f"   Filtro: Plataforma = 'Android' OU 'iOS'")
-        df_app = fetch_app_data_2025(client)
-        
+        app_rows = fetch_app_data_2025(client)
+
         # 3. Exportação
         logger.info("\n📋 ETAPA 3/3: Exportação")
-        filepath = export_to_excel(df_app)
-        
+        run_timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filepath = export_to_excel(app_rows, run_timestamp)
+
         # Resumo final
         logger.info("\n" + "=" * 70)
         logger.info("✅ COLETA CONCLUÍDA COM SUCESSO!")
         logger.info("=" * 70)
-        logger.info(f"📊 Total de registros: {len(df_app)}")
+        logger.info(f"📊 Total de registros: {len(app_rows)}")
         logger.info(f"📁 Arquivo gerado: {filepath}")
         logger.info(f"📅 Período: Janeiro a Dezembro de 2025")
         logger.info(f"📱 Plataformas: Android + iOS")
-        
+
         # Estatísticas gerais
-        total_usuarios = df_app['App_Usuários_total'].sum()
-        total_sessoes = df_app['App_Sessões_total'].sum()
-        total_receita = df_app['App_Receita_total'].sum()
+        total_usuarios = sum(r['App_Usuários_total'] for r in app_rows)
+        total_sessoes = sum(r['App_Sessões_total'] for r in app_rows)
+        total_receita = sum(r['App_Receita_total'] for r in app_rows)
         
         logger.info("\n📈 TOTAIS DO ANO 2025:")
         logger.info(f"   👥 Usuários: {total_usuarios:,}")
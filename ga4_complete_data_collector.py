@@ -9,23 +9,58 @@ Author: Analytics Team
 Version: 2.0
 """
 
+from __future__ import annotations
+
 import os
+import asyncio
+import collections
 import logging
-import pickle
-from datetime import datetime
-from typing import Optional, Dict, List
-import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional, List, TYPE_CHECKING
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
-from google.analytics.data_v1beta import BetaAnalyticsDataClient
+from google.oauth2.credentials import Credentials
+from google.analytics.data_v1beta import BetaAnalyticsDataAsyncClient
+from google.analytics.data_v1beta.services.beta_analytics_data.transports import (
+    BetaAnalyticsDataGrpcAsyncIOTransport
+)
 from google.analytics.data_v1beta.types import (
-    RunReportRequest, DateRange, Dimension, Metric, 
-    OrderBy, FilterExpression, Filter
+    RunReportRequest, BatchRunReportsRequest, DateRange, Dimension, Metric,
+    FilterExpression, Filter, MetricAggregation
 )
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+# pandas e openpyxl custam centenas de ms de import e só são necessários
+# depois da autenticação: ficam adiados para dentro das funções que os usam
+
+# Limita o número de run_report simultâneos (quota de conexões por propriedade)
+_GA4_SEMAPHORE = asyncio.Semaphore(4)
+
+# Janela deslizante de requisições para respeitar a quota por minuto do GA4
+_QPM_LIMIT = 50
+_REQUEST_WINDOW = collections.deque()
+_WINDOW_LOCK = asyncio.Lock()
+
+
+async def _throttle_ga4():
+    """Aguarda se a janela de 60s já contém _QPM_LIMIT requisições"""
+    while True:
+        async with _WINDOW_LOCK:
+            now = time.monotonic()
+            while _REQUEST_WINDOW and now - _REQUEST_WINDOW[0] > 60:
+                _REQUEST_WINDOW.popleft()
+            if len(_REQUEST_WINDOW) < _QPM_LIMIT:
+                _REQUEST_WINDOW.append(now)
+                return
+            wait = 60 - (now - _REQUEST_WINDOW[0])
+        logger.info(f"⏳ Quota por minuto atingida, aguardando {wait:.1f}s")
+        await asyncio.sleep(wait)
+
 # ============================================================================
 # CONFIGURAÇÃO
 # ============================================================================
@@ -39,9 +74,9 @@ class Config:
     }
     
     CLIENT_SECRET_FILE = 'client_secret.json'
-    TOKEN_FILE = 'token.pickle'
+    TOKEN_FILE = 'token.json'
     SCOPES = ['https://www.googleapis.com/auth/analytics.readonly']
-    
+
     # Períodos de análise
     ANALYSIS_YEAR = '2026'
     ANALYSIS_START = '2026-01-01'
@@ -51,51 +86,120 @@ class Config:
     OUTPUT_DIR = 'ga4_reports'
     LOG_FILE = 'ga4_complete_collector.log'
 
+# Nomes dos meses em português (a dimensão 'month' do GA4 vem como '01'..'12')
+_MONTH_NAMES = {
+    '01': 'janeiro', '02': 'fevereiro', '03': 'março',
+    '04': 'abril', '05': 'maio', '06': 'junho',
+    '07': 'julho', '08': 'agosto', '09': 'setembro',
+    '10': 'outubro', '11': 'novembro', '12': 'dezembro'
+}
+
+# Troca os separadores en-US -> pt-BR em uma única passada
+_BR_TRANS = str.maketrans(',.', '.,')
+
+# Cache local das coletas diárias em Parquet: reexecuções dentro da janela
+# de validade leem do disco em vez de consumir quota da API. Passe
+# --refresh na linha de comando para forçar uma nova coleta
+_CACHE_TTL_HOURS = 12
+_FORCE_REFRESH = '--refresh' in sys.argv
+
+# Filtros de dimensão pré-construídos: as expressões são estáticas, então
+# os protobufs são montados uma única vez no import e compartilhados entre
+# as coletas concorrentes
+_ORGANIC_FILTER = FilterExpression(
+    filter=Filter(
+        field_name='sessionDefaultChannelGroup',
+        string_filter=Filter.StringFilter(
+            match_type=Filter.StringFilter.MatchType.EXACT,
+            value='Organic Search'
+        )
+    )
+)
+
+# Web + App em uma única coleta: a separação acontece no cliente pela
+# dimensão 'platform', em vez de duas coletas filtradas
+_ECOMMERCE_FILTER = FilterExpression(
+    filter=Filter(
+        field_name='platform',
+        in_list_filter=Filter.InListFilter(
+            values=['web', 'Android', 'iOS'],
+            case_sensitive=True
+        )
+    )
+)
+
+# Filtro do App usado na requisição mensal suplementar de usuários ativos
+_APP_FILTER = FilterExpression(
+    filter=Filter(
+        field_name='platform',
+        in_list_filter=Filter.InListFilter(
+            values=['Android', 'iOS'],
+            case_sensitive=True
+        )
+    )
+)
+
 # ============================================================================
 # LOGGING
 # ============================================================================
 
 def setup_logging() -> logging.Logger:
-    """Configura logging"""
+    """Configura logging (idempotente: reusa handlers já registrados)"""
+    # Evita handlers duplicados quando outro módulo do pipeline já
+    # configurou o root logger no mesmo processo
+    if logging.getLogger().handlers:
+        return logging.getLogger(__name__)
+
     os.makedirs(Config.OUTPUT_DIR, exist_ok=True)
     log_path = os.path.join(Config.OUTPUT_DIR, Config.LOG_FILE)
-    
+
     log_format = '%(asctime)s | %(levelname)-8s | %(message)s'
     date_format = '%Y-%m-%d %H:%M:%S'
-    
+
     logging.basicConfig(
         level=logging.INFO,
         format=log_format,
         datefmt=date_format,
         handlers=[
-            logging.FileHandler(log_path, encoding='utf-8'),
+            # delay=True: o arquivo só é aberto na primeira mensagem
+            logging.FileHandler(log_path, encoding='utf-8', delay=True),
             logging.StreamHandler()
         ]
     )
-    
+
     logger = logging.getLogger(__name__)
     logger.info("="*80)
     logger.info("GA4 Complete Data Collector - Bemol Group")
     logger.info("="*80)
-    
+
     return logger
 
-logger = setup_logging()
+# A configuração dos handlers acontece uma única vez, em main()
+logger = logging.getLogger(__name__)
 
 # ============================================================================
 # AUTENTICAÇÃO
 # ============================================================================
 
-def authenticate_ga4() -> Optional[BetaAnalyticsDataClient]:
+# Cliente único por processo: evita reler/despicklar o token e permite que
+# as coletas concorrentes compartilhem o mesmo canal HTTP/2 (gRPC multiplexa)
+_client_singleton: Optional[BetaAnalyticsDataAsyncClient] = None
+
+def authenticate_ga4() -> Optional[BetaAnalyticsDataAsyncClient]:
     """Autentica no Google Analytics 4"""
+    global _client_singleton
+    if _client_singleton is not None:
+        return _client_singleton
+
     try:
         logger.info("Iniciando autenticação")
         
         credentials = None
         
         if os.path.exists(Config.TOKEN_FILE):
-            with open(Config.TOKEN_FILE, 'rb') as token:
-                credentials = pickle.load(token)
+            credentials = Credentials.from_authorized_user_file(
+                Config.TOKEN_FILE, Config.SCOPES
+            )
             logger.info("✓ Credenciais carregadas")
         
         if credentials and credentials.valid:
@@ -140,211 +244,317 @@ def authenticate_ga4() -> Optional[BetaAnalyticsDataClient]:
                 logger.error("Autenticação cancelada")
                 return None
             
-            with open(Config.TOKEN_FILE, 'wb') as token:
-                pickle.dump(credentials, token)
+            with open(Config.TOKEN_FILE, 'w', encoding='utf-8') as token:
+                token.write(credentials.to_json())
             logger.info("✓ Credenciais salvas")
         
-        client = BetaAnalyticsDataClient(credentials=credentials)
+        # Canal gRPC afinado para as coletas concorrentes: keepalive mantém
+        # a conexão HTTP/2 viva entre os lotes (sem novo handshake TLS) e a
+        # janela de recepção maior evita estrangular respostas grandes
+        channel = BetaAnalyticsDataGrpcAsyncIOTransport.create_channel(
+            credentials=credentials,
+            options=[
+                ('grpc.keepalive_time_ms', 30000),
+                ('grpc.http2.max_pings_without_data', 0),
+                ('grpc.max_receive_message_length', 64 * 1024 * 1024),
+            ]
+        )
+        _client_singleton = BetaAnalyticsDataAsyncClient(
+            transport=BetaAnalyticsDataGrpcAsyncIOTransport(channel=channel)
+        )
         logger.info("✓ Cliente GA4 criado com sucesso")
-        
-        return client
+
+        return _client_singleton
         
     except Exception as e:
         logger.error(f"Erro na autenticação: {str(e)}", exc_info=True)
         return None
 
 # ============================================================================
-# FUNÇÕES DE COLETA - BEMOL WEB
+# COLETA DIÁRIA SHARDADA
 # ============================================================================
 
-def fetch_bemol_web_data(
-    client: BetaAnalyticsDataClient,
+def _shard_date_range(start_date: str, end_date: str) -> List[tuple]:
+    """Divide o período em shards trimestrais para paralelizar a coleta"""
+    start = datetime.strptime(start_date, '%Y-%m-%d').date()
+    end = datetime.strptime(end_date, '%Y-%m-%d').date()
+
+    shards = []
+    current = start
+    while current <= end:
+        quarter_end_month = ((current.month - 1) // 3) * 3 + 3
+        if quarter_end_month == 12:
+            quarter_end = current.replace(month=12, day=31)
+        else:
+            quarter_end = (
+                current.replace(month=quarter_end_month + 1, day=1)
+                - timedelta(days=1)
+            )
+        shard_end = min(quarter_end, end)
+        shards.append((current.isoformat(), shard_end.isoformat()))
+        current = shard_end + timedelta(days=1)
+
+    return shards
+
+
+async def _fetch_daily(
+    client: BetaAnalyticsDataAsyncClient,
     property_id: str,
     start_date: str,
-    end_date: str
-) -> Optional[pd.DataFrame]:
+    end_date: str,
+    metrics: List[Metric],
+    dimension_filter: FilterExpression,
+    columns: List[str],
+    extra_dimensions: Optional[List[str]] = None
+) -> tuple:
     """
-    Coleta dados para Bemol (web):
-    - Sessões totais (todos os canais)
-    - Receita total (todos os canais)
-    Filtro: platform = 'web'
+    Coleta com dimensão diária ('date'), um shard por trimestre despachado
+    em paralelo. A granularidade diária permite reaproveitar uma única
+    coleta em vários relatórios e agregar por mês no cliente.
+    extra_dimensions adiciona dimensões além de 'date' (ex.: 'platform'),
+    devolvidas como colunas de texto no DataFrame.
+
+    Retorna (DataFrame diário, totais do período por coluna) — os totais
+    vêm agregados pela própria API (MetricAggregation.TOTAL), dispensando
+    uma passada de soma no cliente.
     """
-    try:
-        logger.info("📊 Coletando dados: Bemol (web) - Sessões e Receita totais")
-        
-        # Filtro de plataforma web
-        platform_filter = FilterExpression(
-            filter=Filter(
-                field_name='platform',
-                string_filter=Filter.StringFilter(
-                    match_type=Filter.StringFilter.MatchType.EXACT,
-                    value='web'
-                )
-            )
-        )
-        
-        request = RunReportRequest(
+    import pandas as pd
+
+    extra_dimensions = extra_dimensions or []
+
+    # Cache em disco por (propriedade, período, colunas): reexecuções
+    # recentes não voltam à API. Os totais são recompostos por soma das
+    # linhas diárias (equivalente aos totais da API para as métricas
+    # somáveis; a taxa de engajamento agregada não é consumida de totals)
+    cache_key = '_'.join(extra_dimensions + columns)
+    cache_path = (
+        Path(Config.OUTPUT_DIR) / '.cache' /
+        f"ga4_{property_id}_{start_date}_{end_date}_{cache_key}.parquet"
+    )
+    if not _FORCE_REFRESH and cache_path.exists():
+        age_hours = (time.time() - cache_path.stat().st_mtime) / 3600
+        if age_hours < _CACHE_TTL_HOURS:
+            try:
+                df = pd.read_parquet(cache_path)
+            except Exception as e:
+                logger.warning(f"Cache Parquet ilegível, recoletando: {e}")
+            else:
+                logger.info(f"♻️  Coleta reaproveitada do cache ({age_hours:.1f}h)")
+                return df, {col: float(df[col].sum()) for col in columns}
+
+    dimensions = [Dimension(name="date")] + [
+        Dimension(name=name) for name in extra_dimensions
+    ]
+    requests = [
+        RunReportRequest(
             property=f"properties/{property_id}",
-            dimensions=[
-                Dimension(name="month"),
-                Dimension(name="year")
-            ],
-            metrics=[
-                Metric(name="sessions"),
-                Metric(name="totalRevenue")
-            ],
-            date_ranges=[DateRange(start_date=start_date, end_date=end_date)],
-            dimension_filter=platform_filter,
-            order_bys=[
-                OrderBy(dimension={'dimension_name': 'year'}),
-                OrderBy(dimension={'dimension_name': 'month'})
-            ]
+            dimensions=dimensions,
+            metrics=metrics,
+            date_ranges=[DateRange(start_date=shard_start, end_date=shard_end)],
+            dimension_filter=dimension_filter,
+            metric_aggregations=[MetricAggregation.TOTAL]
         )
-        
-        response = client.run_report(request=request)
-        
-        data = []
-        for row in response.rows:
-            month = row.dimension_values[0].value
-            year = row.dimension_values[1].value
-            
-            data.append({
-                'Mês': month,
-                'Ano': year,
-                'Sessões totais (todos os canais)': int(row.metric_values[0].value),
-                'Receita total (todos os canais)': float(row.metric_values[1].value)
-            })
-        
-        df = pd.DataFrame(data)
-        
-        if not df.empty:
-            # Converter números de mês para nomes em português
-            month_names = {
-                '01': 'janeiro', '02': 'fevereiro', '03': 'março',
-                '04': 'abril', '05': 'maio', '06': 'junho',
-                '07': 'julho', '08': 'agosto', '09': 'setembro',
-                '10': 'outubro', '11': 'novembro', '12': 'dezembro'
-            }
-            df['Mês'] = df['Mês'].map(month_names)
-            
-            logger.info(f"✓ Coletados {len(df)} meses")
-            logger.info(f"  Total Sessões: {df['Sessões totais (todos os canais)'].sum():,.0f}".replace(',', '.'))
-            logger.info(f"  Total Receita: R$ {df['Receita total (todos os canais)'].sum():,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
-        
-        return df
-        
+        for shard_start, shard_end in _shard_date_range(start_date, end_date)
+    ]
+
+    # Os shards são agrupados em lotes de até 5 (limite do batchRunReports):
+    # uma única ida ao servidor por lote em vez de um RPC por trimestre
+    async def _run_batch(batch):
+        async with _GA4_SEMAPHORE:
+            await _throttle_ga4()
+            return await client.batch_run_reports(
+                request=BatchRunReportsRequest(
+                    property=f"properties/{property_id}",
+                    requests=batch
+                )
+            )
+
+    batches = [requests[i:i + 5] for i in range(0, len(requests), 5)]
+    batch_responses = await asyncio.gather(*(_run_batch(b) for b in batches))
+    reports = [
+        report
+        for batch_response in batch_responses
+        for report in batch_response.reports
+    ]
+
+    dates = []
+    extras = [[] for _ in extra_dimensions]
+    values = [[] for _ in columns]
+    totals = dict.fromkeys(columns, 0.0)
+    for response in reports:
+        # Mensagem protobuf crua: lê os campos sem o wrapping por atributo
+        # do proto-plus, que copia valores a cada acesso no loop quente
+        pb = response._pb
+        for row in pb.rows:
+            dates.append(row.dimension_values[0].value)
+            for j, extra in enumerate(extras):
+                extra.append(row.dimension_values[j + 1].value)
+            for i, metric_value in enumerate(row.metric_values):
+                values[i].append(metric_value.value)
+        # Totais do shard calculados pela API; somados entre trimestres
+        if pb.totals:
+            for col, metric_value in zip(columns, pb.totals[0].metric_values):
+                totals[col] += float(metric_value.value)
+
+    df = pd.DataFrame({
+        'date': pd.to_datetime(dates, format='%Y%m%d'),
+        **{name: vals for name, vals in zip(extra_dimensions, extras)},
+        **{col: pd.to_numeric(vals) for col, vals in zip(columns, values)}
+    })
+
+    # Alimenta o cache; sem pyarrow instalado a coleta segue sem cache
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(cache_path, compression='zstd')
     except Exception as e:
-        logger.error(f"Erro ao coletar Bemol Web: {str(e)}", exc_info=True)
-        return None
+        logger.warning(f"Não foi possível gravar o cache Parquet: {e}")
+
+    return df, totals
+
+
+async def _fetch_monthly_users(
+    client: BetaAnalyticsDataAsyncClient,
+    property_id: str,
+    start_date: str,
+    end_date: str,
+    dimension_filter: FilterExpression
+) -> 'pd.Series':
+    """
+    Usuários ativos por mês em uma requisição suplementar de granularidade
+    mensal: a API deduplica visitantes dentro de cada mês, algo que a soma
+    dos ativos diários não faz. Retorna uma Series indexada por período.
+    """
+    import pandas as pd
+
+    request = RunReportRequest(
+        property=f"properties/{property_id}",
+        dimensions=[Dimension(name="year"), Dimension(name="month")],
+        metrics=[Metric(name="activeUsers")],
+        date_ranges=[DateRange(start_date=start_date, end_date=end_date)],
+        dimension_filter=dimension_filter
+    )
+
+    async with _GA4_SEMAPHORE:
+        await _throttle_ga4()
+        response = await client.run_report(request=request)
+
+    pb = response._pb
+    periods = [
+        f"{row.dimension_values[0].value}-{row.dimension_values[1].value}"
+        for row in pb.rows
+    ]
+    users = [row.metric_values[0].value for row in pb.rows]
+
+    series = pd.Series(
+        pd.to_numeric(users),
+        index=pd.PeriodIndex(periods, freq='M'),
+        name='users'
+    )
+    return series.sort_index()
 
 # ============================================================================
-# FUNÇÕES DE COLETA - BEMOL APP
+# FUNÇÕES DE COLETA - ECOMMERCE BEMOL (WEB + APP)
 # ============================================================================
 
-def fetch_bemol_app_data(
-    client: BetaAnalyticsDataClient,
+async def fetch_bemol_ecommerce_data(
+    client: BetaAnalyticsDataAsyncClient,
     property_id: str,
     start_date: str,
     end_date: str
-) -> Optional[pd.DataFrame]:
+) -> tuple:
     """
-    Coleta dados para Bemol (App):
-    - Usuários ativos
-    - Sessões
-    - Receita
-    Filtros: platform IN ('Android', 'iOS')
+    Coleta web e App da propriedade Ecommerce Bemol em uma única ida à API:
+    a dimensão 'platform' substitui os dois filtros separados e a divisão
+    web/App acontece no cliente.
+
+    Retorna (df_bemol_web, df_bemol_app):
+    - Bemol (web): Sessões e Receita totais (platform = 'web')
+    - Bemol (App): Usuários ativos, Sessões e Receita (Android/iOS)
     """
     try:
-        logger.info("📱 Coletando dados: Bemol (App) - Usuários, Sessões e Receita")
-        
-        # Filtro para Android ou iOS
-        platform_filter = FilterExpression(
-            or_group=FilterExpression.FilterExpressionList(
-                expressions=[
-                    FilterExpression(
-                        filter=Filter(
-                            field_name='platform',
-                            string_filter=Filter.StringFilter(
-                                match_type=Filter.StringFilter.MatchType.EXACT,
-                                value='Android'
-                            )
-                        )
-                    ),
-                    FilterExpression(
-                        filter=Filter(
-                            field_name='platform',
-                            string_filter=Filter.StringFilter(
-                                match_type=Filter.StringFilter.MatchType.EXACT,
-                                value='iOS'
-                            )
-                        )
-                    )
-                ]
+        import pandas as pd
+
+        logger.info("📊 Coletando dados: Ecommerce Bemol (web + App) em uma coleta")
+
+        # Sessões e receita saem da coleta diária compartilhada; usuários
+        # ativos do App vêm de uma requisição mensal à parte, porque a API
+        # só deduplica visitantes dentro da granularidade pedida
+        (daily, _), app_monthly_users = await asyncio.gather(
+            _fetch_daily(
+                client, property_id, start_date, end_date,
+                metrics=[
+                    Metric(name="sessions"),
+                    Metric(name="totalRevenue")
+                ],
+                dimension_filter=_ECOMMERCE_FILTER,
+                columns=['sessions', 'revenue'],
+                extra_dimensions=['platform']
+            ),
+            _fetch_monthly_users(
+                client, property_id, start_date, end_date, _APP_FILTER
             )
         )
-        
-        request = RunReportRequest(
-            property=f"properties/{property_id}",
-            dimensions=[
-                Dimension(name="month"),
-                Dimension(name="year")
-            ],
-            metrics=[
-                Metric(name="activeUsers"),
-                Metric(name="sessions"),
-                Metric(name="totalRevenue")
-            ],
-            date_ranges=[DateRange(start_date=start_date, end_date=end_date)],
-            dimension_filter=platform_filter,
-            order_bys=[
-                OrderBy(dimension={'dimension_name': 'year'}),
-                OrderBy(dimension={'dimension_name': 'month'})
-            ]
-        )
-        
-        response = client.run_report(request=request)
-        
-        data = []
-        for row in response.rows:
-            month = row.dimension_values[0].value
-            year = row.dimension_values[1].value
-            
-            data.append({
-                'Mês': month,
-                'Ano': year,
-                'Usuários ativos': int(row.metric_values[0].value),
-                'Sessões': int(row.metric_values[1].value),
-                'Receita': float(row.metric_values[2].value)
-            })
-        
-        df = pd.DataFrame(data)
-        
-        if not df.empty:
-            month_names = {
-                '01': 'janeiro', '02': 'fevereiro', '03': 'março',
-                '04': 'abril', '05': 'maio', '06': 'junho',
-                '07': 'julho', '08': 'agosto', '09': 'setembro',
-                '10': 'outubro', '11': 'novembro', '12': 'dezembro'
-            }
-            df['Mês'] = df['Mês'].map(month_names)
-            
-            logger.info(f"✓ Coletados {len(df)} meses")
-            logger.info(f"  Total Usuários: {df['Usuários ativos'].sum():,.0f}".replace(',', '.'))
-            logger.info(f"  Total Sessões: {df['Sessões'].sum():,.0f}".replace(',', '.'))
-            logger.info(f"  Total Receita: R$ {df['Receita'].sum():,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
-        
-        return df
-        
+
+        # Divisão web/App no cliente; agregação mensal por fatia
+        # (PeriodIndex já sai ordenado)
+        web_daily = daily[daily['platform'] == 'web']
+        app_daily = daily[daily['platform'].isin(('Android', 'iOS'))]
+
+        monthly_web = web_daily.groupby(web_daily['date'].dt.to_period('M'))[
+            ['sessions', 'revenue']
+        ].sum()
+
+        df_web = pd.DataFrame({
+            'Mês': monthly_web.index.strftime('%m'),
+            'Ano': monthly_web.index.strftime('%Y'),
+            'Sessões totais (todos os canais)': monthly_web['sessions'].to_numpy(),
+            'Receita total (todos os canais)': monthly_web['revenue'].to_numpy()
+        })
+
+        if not df_web.empty:
+            # Converter números de mês para nomes em português
+            df_web['Mês'] = df_web['Mês'].map(_MONTH_NAMES)
+
+            logger.info(f"✓ Bemol (web): {len(df_web)} meses")
+            logger.info(f"  Total Sessões: {web_daily['sessions'].sum():,.0f}".replace(',', '.'))
+            logger.info(f"  Total Receita: R$ {web_daily['revenue'].sum():,.2f}".translate(_BR_TRANS))
+
+        # Agregação mensal do App; usuários ativos alinhados pela série
+        # mensal deduplicada pela API
+        monthly_app = app_daily.groupby(app_daily['date'].dt.to_period('M'))[
+            ['sessions', 'revenue']
+        ].sum()
+
+        df_app = pd.DataFrame({
+            'Mês': monthly_app.index.strftime('%m'),
+            'Ano': monthly_app.index.strftime('%Y'),
+            'Usuários ativos': app_monthly_users.reindex(
+                monthly_app.index, fill_value=0
+            ).to_numpy(),
+            'Sessões': monthly_app['sessions'].to_numpy(),
+            'Receita': monthly_app['revenue'].to_numpy()
+        })
+
+        if not df_app.empty:
+            df_app['Mês'] = df_app['Mês'].map(_MONTH_NAMES)
+
+            logger.info(f"✓ Bemol (App): {len(df_app)} meses")
+            logger.info(f"  Total Usuários: {app_monthly_users.sum():,.0f}".replace(',', '.'))
+            logger.info(f"  Total Sessões: {app_daily['sessions'].sum():,.0f}".replace(',', '.'))
+            logger.info(f"  Total Receita: R$ {app_daily['revenue'].sum():,.2f}".translate(_BR_TRANS))
+
+        return df_web, df_app
+
     except Exception as e:
-        logger.error(f"Erro ao coletar Bemol App: {str(e)}", exc_info=True)
-        return None
+        logger.error(f"Erro ao coletar Ecommerce Bemol: {str(e)}", exc_info=True)
+        return None, None
 
 # ============================================================================
 # FUNÇÕES DE COLETA - BEMOL FARMA
 # ============================================================================
 
-def fetch_bemol_farma_data(
-    client: BetaAnalyticsDataClient,
+async def fetch_bemol_farma_data(
+    client: BetaAnalyticsDataAsyncClient,
     property_id: str,
     start_date: str,
     end_date: str
@@ -358,74 +568,59 @@ def fetch_bemol_farma_data(
     Filtro: sessionDefaultChannelGroup = 'Organic Search'
     """
     try:
+        import pandas as pd
+
         logger.info("🏥 Coletando dados: Bemol Farma - Tráfego Orgânico")
-        
-        # Filtro para tráfego orgânico
-        organic_filter = FilterExpression(
-            filter=Filter(
-                field_name='sessionDefaultChannelGroup',
-                string_filter=Filter.StringFilter(
-                    match_type=Filter.StringFilter.MatchType.EXACT,
-                    value='Organic Search'
-                )
+
+        # Sessões, engajamento e receita saem da coleta diária; usuários
+        # orgânicos vêm de uma requisição mensal à parte, porque a API só
+        # deduplica visitantes dentro da granularidade pedida
+        (daily, totals), monthly_users = await asyncio.gather(
+            _fetch_daily(
+                client, property_id, start_date, end_date,
+                metrics=[
+                    Metric(name="sessions"),
+                    Metric(name="engagementRate"),
+                    Metric(name="totalRevenue")
+                ],
+                dimension_filter=_ORGANIC_FILTER,
+                columns=['sessions', 'engagement', 'revenue']
+            ),
+            _fetch_monthly_users(
+                client, property_id, start_date, end_date, _ORGANIC_FILTER
             )
         )
-        
-        request = RunReportRequest(
-            property=f"properties/{property_id}",
-            dimensions=[
-                Dimension(name="month"),
-                Dimension(name="year")
-            ],
-            metrics=[
-                Metric(name="sessions"),
-                Metric(name="activeUsers"),
-                Metric(name="engagementRate"),
-                Metric(name="totalRevenue")
-            ],
-            date_ranges=[DateRange(start_date=start_date, end_date=end_date)],
-            dimension_filter=organic_filter,
-            order_bys=[
-                OrderBy(dimension={'dimension_name': 'year'}),
-                OrderBy(dimension={'dimension_name': 'month'})
-            ]
-        )
-        
-        response = client.run_report(request=request)
-        
-        data = []
-        for row in response.rows:
-            month = row.dimension_values[0].value
-            year = row.dimension_values[1].value
-            
+
+        # Agregação mensal no cliente: a taxa de engajamento é recomposta
+        # como média diária ponderada pelas sessões
+        daily['engaged'] = daily['engagement'] * daily['sessions']
+        monthly = daily.groupby(daily['date'].dt.to_period('M'))[
+            ['sessions', 'engaged', 'revenue']
+        ].sum()
+
+        df = pd.DataFrame({
+            'Mês': monthly.index.strftime('%m'),
+            'Ano': monthly.index.strftime('%Y'),
+            'Sessões orgânicas': monthly['sessions'].to_numpy(),
+            'Usuários orgânicos': monthly_users.reindex(
+                monthly.index, fill_value=0
+            ).to_numpy(),
             # Taxa de engajamento vem como decimal (0.75 = 75%)
-            engagement_rate = float(row.metric_values[2].value) * 100
-            
-            data.append({
-                'Mês': month,
-                'Ano': year,
-                'Sessões orgânicas': int(row.metric_values[0].value),
-                'Usuários orgânicos': int(row.metric_values[1].value),
-                'Taxa de engajamento (%)': round(engagement_rate, 2),
-                'Receita orgânica': float(row.metric_values[3].value)
-            })
-        
-        df = pd.DataFrame(data)
+            'Taxa de engajamento (%)': (
+                monthly['engaged'] / monthly['sessions'] * 100
+            ).round(2).to_numpy(),
+            'Receita orgânica': monthly['revenue'].to_numpy()
+        })
         
         if not df.empty:
-            month_names = {
-                '01': 'janeiro', '02': 'fevereiro', '03': 'março',
-                '04': 'abril', '05': 'maio', '06': 'junho',
-                '07': 'julho', '08': 'agosto', '09': 'setembro',
-                '10': 'outubro', '11': 'novembro', '12': 'dezembro'
-            }
-            df['Mês'] = df['Mês'].map(month_names)
-            
+            df['Mês'] = df['Mês'].map(_MONTH_NAMES)
+
             logger.info(f"✓ Coletados {len(df)} meses")
-            logger.info(f"  Total Sessões: {df['Sessões orgânicas'].sum():,.0f}".replace(',', '.'))
-            logger.info(f"  Total Usuários: {df['Usuários orgânicos'].sum():,.0f}".replace(',', '.'))
+            # Totais agregados pela API, sem nova passada de soma no cliente
+            logger.info(f"  Total Sessões: {totals['sessions']:,.0f}".replace(',', '.'))
+            logger.info(f"  Total Usuários: {monthly_users.sum():,.0f}".replace(',', '.'))
             logger.info(f"  Engajamento médio: {df['Taxa de engajamento (%)'].mean():.2f}%")
-            logger.info(f"  Total Receita: R$ {df['Receita orgânica'].sum():,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
+            logger.info(f"  Total Receita: R$ {totals['revenue']:,.2f}".translate(_BR_TRANS))
         
         return df
         
@@ -440,33 +635,44 @@ def fetch_bemol_farma_data(
 def export_to_excel(
     df_bemol_web: pd.DataFrame,
     df_bemol_app: pd.DataFrame,
-    df_bemol_farma: pd.DataFrame
+    df_bemol_farma: pd.DataFrame,
+    timestamp: str
 ) -> str:
     """Exporta todos os dados para Excel com 3 sheets"""
     try:
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import (
+            Font, PatternFill, Alignment, Border, Side, NamedStyle
+        )
+        from openpyxl.utils import get_column_letter
+
         filename = f'GA4_Bemol_Complete_{Config.ANALYSIS_YEAR}_{timestamp}.xlsx'
-        filepath = os.path.join(Config.OUTPUT_DIR, filename)
-        
+        filepath = Path(Config.OUTPUT_DIR) / filename
+
         logger.info("📝 Gerando arquivo Excel...")
-        
-        with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-            if df_bemol_web is not None and not df_bemol_web.empty:
-                df_bemol_web.to_excel(writer, sheet_name='Bemol (web)', index=False)
-                logger.info("  ✓ Sheet: Bemol (web)")
-            
-            if df_bemol_app is not None and not df_bemol_app.empty:
-                df_bemol_app.to_excel(writer, sheet_name='Bemol (App)', index=False)
-                logger.info("  ✓ Sheet: Bemol (App)")
-            
-            if df_bemol_farma is not None and not df_bemol_farma.empty:
-                df_bemol_farma.to_excel(writer, sheet_name='Bemol Farma', index=False)
-                logger.info("  ✓ Sheet: Bemol Farma")
-        
-        # Formatação
-        wb = load_workbook(filepath)
-        
-        # Cores e estilos
+
+        frames = {}
+        if df_bemol_web is not None and not df_bemol_web.empty:
+            frames['Bemol (web)'] = df_bemol_web
+        if df_bemol_app is not None and not df_bemol_app.empty:
+            frames['Bemol (App)'] = df_bemol_app
+        if df_bemol_farma is not None and not df_bemol_farma.empty:
+            frames['Bemol Farma'] = df_bemol_farma
+
+        if not frames:
+            logger.error("❌ Nenhum dado para exportar!")
+            return ""
+
+        # Workbook write-only: cada linha é serializada direto para o
+        # arquivo (≈1 linha residente na memória), sem montar o DOM
+        # inteiro nem reabrir o workbook para uma segunda passada de
+        # formatação — os estilos entram junto com a escrita
+        wb = Workbook(write_only=True)
+
+        # Cores e estilos: singletons criados uma vez e atribuídos por
+        # referência — cada Alignment/Border novo dentro do loop forçaria
+        # o rehash da tabela de estilos do openpyxl a cada célula
         header_fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
         header_font = Font(bold=True, color='FFFFFF', size=11)
         thin_border = Border(
@@ -475,63 +681,72 @@ def export_to_excel(
             top=Side(style='thin'),
             bottom=Side(style='thin')
         )
-        
-        for sheet_name in wb.sheetnames:
-            ws = wb[sheet_name]
-            
-            # Formatar cabeçalho
-            for cell in ws[1]:
+        align_center = Alignment(horizontal='center', vertical='center')
+        align_left = Alignment(horizontal='left', vertical='center')
+        align_right = Alignment(horizontal='right', vertical='center')
+
+        # Um NamedStyle por tipo de coluna, registrado uma única vez no
+        # workbook e aplicado por nome às células
+        for name, number_format, alignment in (
+            ('col_text', 'General', align_left),
+            ('col_int', '#,##0', align_right),
+            ('col_money', 'R$ #,##0.00', align_right),
+            ('col_pct', '0.00"%"', align_right),
+        ):
+            style = NamedStyle(name=name)
+            style.number_format = number_format
+            style.alignment = alignment
+            style.border = thin_border
+            wb.add_named_style(style)
+
+        for sheet_name, df in frames.items():
+            ws = wb.create_sheet(sheet_name)
+            # Congelar primeira linha
+            ws.freeze_panes = 'A2'
+
+            # Classificação das colunas feita uma única vez por sheet;
+            # larguras via redução vetorizada sobre o DataFrame de origem
+            col_kind = []
+            for i, col in enumerate(df.columns, start=1):
+                header = str(col)
+                if i <= 2:
+                    col_kind.append('col_text')
+                elif 'Receita' in header:
+                    col_kind.append('col_money')
+                elif '%' in header:
+                    col_kind.append('col_pct')
+                else:
+                    col_kind.append('col_int')
+
+                max_length = max(
+                    int(df[col].astype(str).str.len().max()), len(header)
+                )
+                ws.column_dimensions[get_column_letter(i)].width = min(max_length + 2, 30)
+
+            header_cells = []
+            for col in df.columns:
+                cell = WriteOnlyCell(ws, value=col)
                 cell.fill = header_fill
                 cell.font = header_font
-                cell.alignment = Alignment(horizontal='center', vertical='center')
+                cell.alignment = align_center
                 cell.border = thin_border
-            
-            # Ajustar larguras
-            for col in ws.columns:
-                max_length = 0
-                col_letter = get_column_letter(col[0].column)
-                
-                for cell in col:
-                    try:
-                        if cell.value:
-                            max_length = max(max_length, len(str(cell.value)))
-                    except:
-                        pass
-                
-                adjusted_width = min(max_length + 2, 30)
-                ws.column_dimensions[col_letter].width = adjusted_width
-            
-            # Formatar células de dados
-            for row_idx, row in enumerate(ws.iter_rows(min_row=2, max_row=ws.max_row), start=2):
-                for col_idx, cell in enumerate(row, start=1):
-                    cell.border = thin_border
-                    cell.alignment = Alignment(horizontal='right', vertical='center')
-                    
-                    col_letter = get_column_letter(col_idx)
-                    
-                    # Mês e Ano - alinhar à esquerda
-                    if col_letter in ['A', 'B']:
-                        cell.alignment = Alignment(horizontal='left', vertical='center')
-                    
-                    # Números inteiros (sessões, usuários)
-                    elif cell.value and isinstance(cell.value, (int, float)) and 'Receita' not in str(ws[f'{col_letter}1'].value) and '%' not in str(ws[f'{col_letter}1'].value):
-                        cell.number_format = '#,##0'
-                    
-                    # Receita (moeda)
-                    elif cell.value and 'Receita' in str(ws[f'{col_letter}1'].value):
-                        cell.number_format = 'R$ #,##0.00'
-                    
-                    # Percentual
-                    elif cell.value and '%' in str(ws[f'{col_letter}1'].value):
-                        cell.number_format = '0.00"%"'
-            
-            # Congelar primeira linha
-            ws.freeze_panes = 'A2'
-        
+                header_cells.append(cell)
+            ws.append(header_cells)
+
+            for row in df.itertuples(index=False, name=None):
+                cells = []
+                for kind, value in zip(col_kind, row):
+                    cell = WriteOnlyCell(ws, value=value)
+                    cell.style = kind
+                    cells.append(cell)
+                ws.append(cells)
+
+            logger.info(f"  ✓ Sheet: {sheet_name}")
+
         wb.save(filepath)
-        
+
         logger.info(f"✅ Arquivo Excel criado: {filepath}")
-        return filepath
+        return str(filepath)
         
     except Exception as e:
         logger.error(f"Erro ao exportar Excel: {str(e)}", exc_info=True)
@@ -544,6 +759,8 @@ def export_to_excel(
 def main():
     """Função principal"""
     try:
+        setup_logging()
+
         print("\n" + "="*80)
         print("GA4 COMPLETE DATA COLLECTOR - BEMOL GROUP")
         print("="*80)
@@ -553,12 +770,6 @@ def main():
         print(f"  • Bemol Farma: {Config.PROPERTIES['bemol_farma']}")
         print("="*80 + "\n")
         
-        # Autenticação
-        client = authenticate_ga4()
-        if not client:
-            logger.error("❌ Falha na autenticação")
-            return
-        
         os.makedirs(Config.OUTPUT_DIR, exist_ok=True)
         
         # ====================================================================
@@ -569,33 +780,37 @@ def main():
         logger.info("INICIANDO COLETA DE DADOS")
         logger.info("="*80 + "\n")
         
-        # 1. Bemol (web) - da propriedade Ecommerce Bemol
-        df_bemol_web = fetch_bemol_web_data(
-            client,
-            Config.PROPERTIES['ecommerce_bemol'],
-            Config.ANALYSIS_START,
-            Config.ANALYSIS_END
-        )
-        
-        print()  # Espaço visual
-        
-        # 2. Bemol (App) - da propriedade Ecommerce Bemol
-        df_bemol_app = fetch_bemol_app_data(
-            client,
-            Config.PROPERTIES['ecommerce_bemol'],
-            Config.ANALYSIS_START,
-            Config.ANALYSIS_END
-        )
-        
-        print()  # Espaço visual
-        
-        # 3. Bemol Farma - da propriedade Bemol Farma
-        df_bemol_farma = fetch_bemol_farma_data(
-            client,
-            Config.PROPERTIES['bemol_farma'],
-            Config.ANALYSIS_START,
-            Config.ANALYSIS_END
-        )
+        # As três coletas são independentes (propriedades/filtros distintos):
+        # dispara em paralelo e espera pelo relatório mais lento.
+        # A autenticação cria o canal gRPC assíncrono, então precisa rodar
+        # dentro do event loop.
+        async def _collect_all():
+            client = authenticate_ga4()
+            if not client:
+                return None
+            return await asyncio.gather(
+                # 1. Bemol (web) + Bemol (App) - uma coleta da propriedade
+                #    Ecommerce Bemol, dividida por plataforma no cliente
+                fetch_bemol_ecommerce_data(
+                    client,
+                    Config.PROPERTIES['ecommerce_bemol'],
+                    Config.ANALYSIS_START,
+                    Config.ANALYSIS_END
+                ),
+                # 2. Bemol Farma - da propriedade Bemol Farma
+                fetch_bemol_farma_data(
+                    client,
+                    Config.PROPERTIES['bemol_farma'],
+                    Config.ANALYSIS_START,
+                    Config.ANALYSIS_END
+                )
+            )
+
+        results = asyncio.run(_collect_all())
+        if results is None:
+            logger.error("❌ Falha na autenticação")
+            return
+        (df_bemol_web, df_bemol_app), df_bemol_farma = results
         
         # ====================================================================
         # EXPORTAÇÃO
@@ -605,7 +820,10 @@ def main():
         logger.info("EXPORTANDO RESULTADOS")
         logger.info("="*80 + "\n")
         
-        excel_path = export_to_excel(df_bemol_web, df_bemol_app, df_bemol_farma)
+        run_timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        excel_path = export_to_excel(
+            df_bemol_web, df_bemol_app, df_bemol_farma, run_timestamp
+        )
         
         # ====================================================================
         # RESUMO FINAL
@@ -622,14 +840,14 @@ def main():
             print(f"\n🌐 BEMOL (WEB) - Ecommerce Bemol")
             print(f"   Meses: {len(df_bemol_web)}")
             print(f"   Sessões Totais: {df_bemol_web['Sessões totais (todos os canais)'].sum():,.0f}".replace(',', '.'))
-            print(f"   Receita Total: R$ {df_bemol_web['Receita total (todos os canais)'].sum():,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
+            print(f"   Receita Total: R$ {df_bemol_web['Receita total (todos os canais)'].sum():,.2f}".translate(_BR_TRANS))
         
         if df_bemol_app is not None and not df_bemol_app.empty:
             print(f"\n📱 BEMOL (APP) - Ecommerce Bemol")
             print(f"   Meses: {len(df_bemol_app)}")
             print(f"   Usuários Ativos: {df_bemol_app['Usuários ativos'].sum():,.0f}".replace(',', '.'))
             print(f"   Sessões: {df_bemol_app['Sessões'].sum():,.0f}".replace(',', '.'))
-            print(f"   Receita: R$ {df_bemol_app['Receita'].sum():,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
+            print(f"   Receita: R$ {df_bemol_app['Receita'].sum():,.2f}".translate(_BR_TRANS))
         
         if df_bemol_farma is not None and not df_bemol_farma.empty:
             print(f"\n🏥 BEMOL FARMA - Tráfego Orgânico")
@@ -637,7 +855,7 @@ def main():
             print(f"   Sessões Orgânicas: {df_bemol_farma['Sessões orgânicas'].sum():,.0f}".replace(',', '.'))
             print(f"   Usuários Orgânicos: {df_bemol_farma['Usuários orgânicos'].sum():,.0f}".replace(',', '.'))
             print(f"   Taxa Engajamento Média: {df_bemol_farma['Taxa de engajamento (%)'].mean():.2f}%")
-            print(f"   Receita Orgânica: R$ {df_bemol_farma['Receita orgânica'].sum():,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
+            print(f"   Receita Orgânica: R$ {df_bemol_farma['Receita orgânica'].sum():,.2f}".translate(_BR_TRANS))
         
         print("\n" + "="*80 + "\n")
         
@@ -12,19 +12,22 @@ Version: 2.1 - FIXED
 """
 
 import os
+import functools
+import hashlib
+import locale
 import logging
-import pickle
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional, Dict, List
+from pathlib import Path
+from typing import Optional, List
 import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
 from google.analytics.data_v1beta import BetaAnalyticsDataClient
 from google.analytics.data_v1beta.types import (
-    RunReportRequest, DateRange, Dimension, Metric, 
+    RunReportRequest, BatchRunReportsRequest, DateRange, Dimension, Metric,
     OrderBy, FilterExpression, Filter
 )
 
@@ -41,7 +44,7 @@ class Config:
     }
     
     CLIENT_SECRET_FILE = 'client_secret.json'
-    TOKEN_FILE = 'token.pickle'
+    TOKEN_FILE = 'token.json'
     SCOPES = ['https://www.googleapis.com/auth/analytics.readonly']
     
     # ⚠️ IMPORTANTE: Período de análise ajustado para 2025
@@ -54,14 +57,97 @@ class Config:
     OUTPUT_DIR = 'ga4_reports'
     LOG_FILE = 'ga4_complete_collector.log'
 
+# Diretório de saída resolvido uma única vez; os caminhos derivados usam
+# o operador / do pathlib em vez de os.path.join repetido
+_OUTPUT_DIR = Path(Config.OUTPUT_DIR)
+
+# ============================================================================
+# FILTROS DE DIMENSÃO
+# ============================================================================
+
+# Expressões estáticas: os protobufs são montados uma única vez no import
+# e reaproveitados em todas as coletas, em vez de reconstruídos por chamada
+
+# Filtro de plataforma web
+_WEB_FILTER = FilterExpression(
+    filter=Filter(
+        field_name='platform',
+        string_filter=Filter.StringFilter(
+            match_type=Filter.StringFilter.MatchType.EXACT,
+            value='web'
+        )
+    )
+)
+
+# ✅ CORRIGIDO: Sintaxe correta para filtro OR (Android OU iOS)
+_APP_FILTER = FilterExpression(
+    or_group={
+        'expressions': [
+            FilterExpression(
+                filter=Filter(
+                    field_name='platform',
+                    string_filter=Filter.StringFilter(
+                        match_type=Filter.StringFilter.MatchType.EXACT,
+                        value='Android'
+                    )
+                )
+            ),
+            FilterExpression(
+                filter=Filter(
+                    field_name='platform',
+                    string_filter=Filter.StringFilter(
+                        match_type=Filter.StringFilter.MatchType.EXACT,
+                        value='iOS'
+                    )
+                )
+            )
+        ]
+    }
+)
+
+# Filtro para tráfego orgânico
+_ORGANIC_FILTER = FilterExpression(
+    filter=Filter(
+        field_name='sessionDefaultChannelGroup',
+        string_filter=Filter.StringFilter(
+            match_type=Filter.StringFilter.MatchType.EXACT,
+            value='Organic Search'
+        )
+    )
+)
+
+# ============================================================================
+# FORMATAÇÃO NUMÉRICA (PADRÃO BRASILEIRO)
+# ============================================================================
+
+# Usa o locale do sistema quando pt_BR está instalado; caso contrário cai
+# na inversão manual dos separadores do formato en-US
+try:
+    locale.setlocale(locale.LC_NUMERIC, 'pt_BR.UTF-8')
+    _HAS_PT_BR_LOCALE = True
+except locale.Error:
+    _HAS_PT_BR_LOCALE = False
+
+# Troca os separadores en-US -> pt-BR em uma única passada
+_BR_TRANS = str.maketrans(',.', '.,')
+
+@functools.lru_cache(maxsize=4096)
+def format_brl(value: float, decimals: int = 2) -> str:
+    """Formata um número no padrão brasileiro (1.234.567,89)"""
+    if _HAS_PT_BR_LOCALE:
+        return locale.format_string(f'%.{decimals}f', value, grouping=True)
+    if decimals == 0:
+        return f'{value:,.0f}'.replace(',', '.')
+    return f'{value:,.{decimals}f}'.translate(_BR_TRANS)
+
 # ============================================================================
 # LOGGING
 # ============================================================================
 
 def setup_logging() -> logging.Logger:
     """Configura logging"""
-    os.makedirs(Config.OUTPUT_DIR, exist_ok=True)
-    log_path = os.path.join(Config.OUTPUT_DIR, Config.LOG_FILE)
+    _OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    log_path = _OUTPUT_DIR / Config.LOG_FILE
     
     log_format = '%(asctime)s | %(levelname)-8s | %(message)s'
     date_format = '%Y-%m-%d %H:%M:%S'
@@ -89,16 +175,25 @@ logger = setup_logging()
 # AUTENTICAÇÃO
 # ============================================================================
 
+# Cliente único por processo: mantém o mesmo canal HTTP/2 entre as
+# coletas (sem repetir handshake TLS) e evita reler o token salvo
+_client_singleton: Optional[BetaAnalyticsDataClient] = None
+
 def authenticate_ga4() -> Optional[BetaAnalyticsDataClient]:
     """Autentica no Google Analytics 4"""
+    global _client_singleton
+    if _client_singleton is not None:
+        return _client_singleton
+
     try:
         logger.info("Iniciando autenticação")
         
         credentials = None
         
         if os.path.exists(Config.TOKEN_FILE):
-            with open(Config.TOKEN_FILE, 'rb') as token:
-                credentials = pickle.load(token)
+            credentials = Credentials.from_authorized_user_file(
+                Config.TOKEN_FILE, Config.SCOPES
+            )
             logger.info("✓ Credenciais carregadas")
         
         if credentials and credentials.valid:
@@ -143,210 +238,210 @@ def authenticate_ga4() -> Optional[BetaAnalyticsDataClient]:
                 logger.error("Autenticação cancelada")
                 return None
             
-            with open(Config.TOKEN_FILE, 'wb') as token:
-                pickle.dump(credentials, token)
+            with open(Config.TOKEN_FILE, 'w', encoding='utf-8') as token:
+                token.write(credentials.to_json())
             logger.info("✓ Credenciais salvas")
         
-        client = BetaAnalyticsDataClient(credentials=credentials)
+        _client_singleton = BetaAnalyticsDataClient(credentials=credentials)
         logger.info("✓ Cliente GA4 criado com sucesso")
-        
-        return client
+
+        return _client_singleton
         
     except Exception as e:
         logger.error(f"Erro na autenticação: {str(e)}", exc_info=True)
         return None
 
 # ============================================================================
-# FUNÇÕES DE COLETA - BEMOL WEB
+# FUNÇÕES DE COLETA - PAGINAÇÃO
 # ============================================================================
 
-def fetch_bemol_web_data(
-    client: BetaAnalyticsDataClient,
-    property_id: str,
-    start_date: str,
-    end_date: str
-) -> Optional[pd.DataFrame]:
+# Tamanho de página padrão da API (limite implícito quando 'limit' não é
+# enviado); relatórios maiores exigem paginação explícita
+_PAGE_SIZE = 10000
+
+def _iter_report_rows(client: BetaAnalyticsDataClient, request: RunReportRequest):
     """
-    Coleta dados para Bemol (web):
-    - Sessões totais (todos os canais)
-    - Receita total (todos os canais)
-    Filtro: platform = 'web'
+    Itera as linhas de um relatório paginando via limit/offset, de modo
+    que resultados acima do tamanho de página da API cheguem completos
+    sem precisar reter mais de uma página de resposta por vez
     """
-    try:
-        logger.info("📊 Coletando dados: Bemol (web) - Sessões e Receita totais")
-        
-        # Filtro de plataforma web
-        platform_filter = FilterExpression(
-            filter=Filter(
-                field_name='platform',
-                string_filter=Filter.StringFilter(
-                    match_type=Filter.StringFilter.MatchType.EXACT,
-                    value='web'
-                )
-            )
-        )
-        
-        request = RunReportRequest(
-            property=f"properties/{property_id}",
-            dimensions=[
-                Dimension(name="month"),
-                Dimension(name="year")
-            ],
-            metrics=[
-                Metric(name="sessions"),
-                Metric(name="totalRevenue")
-            ],
-            date_ranges=[DateRange(start_date=start_date, end_date=end_date)],
-            dimension_filter=platform_filter,
-            order_bys=[
-                OrderBy(dimension={'dimension_name': 'year'}),
-                OrderBy(dimension={'dimension_name': 'month'})
-            ]
-        )
-        
+    offset = 0
+    while True:
+        request.offset = offset
+        request.limit = _PAGE_SIZE
         response = client.run_report(request=request)
-        
-        data = []
-        for row in response.rows:
-            month = row.dimension_values[0].value
-            year = row.dimension_values[1].value
-            
-            data.append({
-                'Mês': month,
-                'Ano': year,
-                'Sessões totais (todos os canais)': int(row.metric_values[0].value),
-                'Receita total (todos os canais)': float(row.metric_values[1].value)
-            })
-        
-        df = pd.DataFrame(data)
-        
-        if not df.empty:
-            # Converter números de mês para nomes em português
-            month_names = {
-                '01': 'janeiro', '02': 'fevereiro', '03': 'março',
-                '04': 'abril', '05': 'maio', '06': 'junho',
-                '07': 'julho', '08': 'agosto', '09': 'setembro',
-                '10': 'outubro', '11': 'novembro', '12': 'dezembro'
-            }
-            df['Mês'] = df['Mês'].map(month_names)
-            
-            logger.info(f"✓ Coletados {len(df)} meses")
-            logger.info(f"  Total Sessões: {df['Sessões totais (todos os canais)'].sum():,.0f}".replace(',', '.'))
-            logger.info(f"  Total Receita: R$ {df['Receita total (todos os canais)'].sum():,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
-        else:
-            logger.warning("⚠️  Nenhum dado encontrado para Bemol Web")
-        
-        return df
-        
-    except Exception as e:
-        logger.error(f"Erro ao coletar Bemol Web: {str(e)}", exc_info=True)
-        return None
+        yield from response.rows
+        if len(response.rows) < _PAGE_SIZE:
+            return
+        offset += len(response.rows)
 
 # ============================================================================
-# FUNÇÕES DE COLETA - BEMOL APP (CORRIGIDO)
+# FUNÇÕES DE COLETA - ECOMMERCE BEMOL (WEB + APP EM LOTE)
 # ============================================================================
 
-def fetch_bemol_app_data(
+def _parse_web_report(report) -> pd.DataFrame:
+    """
+    Converte o relatório Bemol (web) em DataFrame:
+    - Sessões totais (todos os canais)
+    - Receita total (todos os canais)
+    """
+    # Construção colunar: listas por coluna e casts em bloco via astype
+    # (em C), sem alocar um dict nem converter valor a valor por linha
+    months, years, sessions, revenue = [], [], [], []
+    for row in report.rows:
+        dv, mv = row.dimension_values, row.metric_values
+        months.append(dv[0].value)
+        years.append(dv[1].value)
+        sessions.append(mv[0].value)
+        revenue.append(mv[1].value)
+
+    df = pd.DataFrame({
+        'Mês': months,
+        'Ano': years,
+        'Sessões totais (todos os canais)': sessions,
+        'Receita total (todos os canais)': revenue
+    }).astype({
+        'Sessões totais (todos os canais)': int,
+        'Receita total (todos os canais)': float
+    })
+
+    if not df.empty:
+        # Converter números de mês para nomes em português
+        month_names = {
+            '01': 'janeiro', '02': 'fevereiro', '03': 'março',
+            '04': 'abril', '05': 'maio', '06': 'junho',
+            '07': 'julho', '08': 'agosto', '09': 'setembro',
+            '10': 'outubro', '11': 'novembro', '12': 'dezembro'
+        }
+        df['Mês'] = df['Mês'].map(month_names)
+
+        # Totais em uma única passada sobre o DataFrame
+        totals = df.agg({
+            'Sessões totais (todos os canais)': 'sum',
+            'Receita total (todos os canais)': 'sum'
+        })
+        logger.info(f"✓ Coletados {len(df)} meses")
+        logger.info(f"  Total Sessões: {format_brl(totals['Sessões totais (todos os canais)'], 0)}")
+        logger.info(f"  Total Receita: R$ {format_brl(totals['Receita total (todos os canais)'])}")
+    else:
+        logger.warning("⚠️  Nenhum dado encontrado para Bemol Web")
+
+    return df
+
+def _parse_app_report(report) -> pd.DataFrame:
+    """
+    Converte o relatório Bemol (App) em DataFrame:
+    - Usuários ativos
+    - Sessões
+    - Receita
+    """
+    # Construção colunar: listas por coluna e casts em bloco via astype
+    months, years, users, sessions, revenue = [], [], [], [], []
+    for row in report.rows:
+        dv, mv = row.dimension_values, row.metric_values
+        months.append(dv[0].value)
+        years.append(dv[1].value)
+        users.append(mv[0].value)
+        sessions.append(mv[1].value)
+        revenue.append(mv[2].value)
+
+    df = pd.DataFrame({
+        'Mês': months,
+        'Ano': years,
+        'Usuários ativos': users,
+        'Sessões': sessions,
+        'Receita': revenue
+    }).astype({
+        'Usuários ativos': int,
+        'Sessões': int,
+        'Receita': float
+    })
+
+    if not df.empty:
+        month_names = {
+            '01': 'janeiro', '02': 'fevereiro', '03': 'março',
+            '04': 'abril', '05': 'maio', '06': 'junho',
+            '07': 'julho', '08': 'agosto', '09': 'setembro',
+            '10': 'outubro', '11': 'novembro', '12': 'dezembro'
+        }
+        df['Mês'] = df['Mês'].map(month_names)
+
+        # Totais em uma única passada sobre o DataFrame
+        totals = df.agg({
+            'Usuários ativos': 'sum', 'Sessões': 'sum', 'Receita': 'sum'
+        })
+        logger.info(f"✓ Coletados {len(df)} meses")
+        logger.info(f"  Total Usuários: {format_brl(totals['Usuários ativos'], 0)}")
+        logger.info(f"  Total Sessões: {format_brl(totals['Sessões'], 0)}")
+        logger.info(f"  Total Receita: R$ {format_brl(totals['Receita'])}")
+    else:
+        logger.warning("⚠️  Nenhum dado encontrado para Bemol App")
+
+    return df
+
+def fetch_ecommerce_data(
     client: BetaAnalyticsDataClient,
     property_id: str,
     start_date: str,
     end_date: str
-) -> Optional[pd.DataFrame]:
+):
     """
-    Coleta dados para Bemol (App):
-    - Usuários ativos
-    - Sessões
-    - Receita
-    Filtros: platform IN ('Android', 'iOS')
-    
-    CORREÇÃO: Usando a sintaxe correta para filtro OR
+    Coleta Bemol (web) e Bemol (App) da mesma propriedade em uma única
+    RPC via batchRunReports (um round-trip TCP/TLS/HTTP2 em vez de dois)
+
+    Filtros: platform = 'web' | platform IN ('Android', 'iOS')
+    Retorna (df_web, df_app)
     """
     try:
-        logger.info("📱 Coletando dados: Bemol (App) - Usuários, Sessões e Receita")
-        
-        # ✅ CORRIGIDO: Sintaxe correta para filtro OR
-        platform_filter = FilterExpression(
-            or_group={
-                'expressions': [
-                    FilterExpression(
-                        filter=Filter(
-                            field_name='platform',
-                            string_filter=Filter.StringFilter(
-                                match_type=Filter.StringFilter.MatchType.EXACT,
-                                value='Android'
-                            )
-                        )
-                    ),
-                    FilterExpression(
-                        filter=Filter(
-                            field_name='platform',
-                            string_filter=Filter.StringFilter(
-                                match_type=Filter.StringFilter.MatchType.EXACT,
-                                value='iOS'
-                            )
-                        )
-                    )
-                ]
-            }
-        )
-        
-        request = RunReportRequest(
+        logger.info("📊 Coletando dados: Bemol (web) + Bemol (App) em lote")
+
+        order_bys = [
+            OrderBy(dimension={'dimension_name': 'year'}),
+            OrderBy(dimension={'dimension_name': 'month'})
+        ]
+        dimensions = [
+            Dimension(name="month"),
+            Dimension(name="year")
+        ]
+
+        web_request = RunReportRequest(
             property=f"properties/{property_id}",
-            dimensions=[
-                Dimension(name="month"),
-                Dimension(name="year")
+            dimensions=dimensions,
+            metrics=[
+                Metric(name="sessions"),
+                Metric(name="totalRevenue")
             ],
+            date_ranges=[DateRange(start_date=start_date, end_date=end_date)],
+            dimension_filter=_WEB_FILTER,
+            order_bys=order_bys
+        )
+
+        app_request = RunReportRequest(
+            property=f"properties/{property_id}",
+            dimensions=dimensions,
             metrics=[
                 Metric(name="activeUsers"),
                 Metric(name="sessions"),
                 Metric(name="totalRevenue")
             ],
             date_ranges=[DateRange(start_date=start_date, end_date=end_date)],
-            dimension_filter=platform_filter,
-            order_bys=[
-                OrderBy(dimension={'dimension_name': 'year'}),
-                OrderBy(dimension={'dimension_name': 'month'})
-            ]
+            dimension_filter=_APP_FILTER,
+            order_bys=order_bys
         )
-        
-        response = client.run_report(request=request)
-        
-        data = []
-        for row in response.rows:
-            month = row.dimension_values[0].value
-            year = row.dimension_values[1].value
-            
-            data.append({
-                'Mês': month,
-                'Ano': year,
-                'Usuários ativos': int(row.metric_values[0].value),
-                'Sessões': int(row.metric_values[1].value),
-                'Receita': float(row.metric_values[2].value)
-            })
-        
-        df = pd.DataFrame(data)
-        
-        if not df.empty:
-            month_names = {
-                '01': 'janeiro', '02': 'fevereiro', '03': 'março',
-                '04': 'abril', '05': 'maio', '06': 'junho',
-                '07': 'julho', '08': 'agosto', '09': 'setembro',
-                '10': 'outubro', '11': 'novembro', '12': 'dezembro'
-            }
-            df['Mês'] = df['Mês'].map(month_names)
-            
-            logger.info(f"✓ Coletados {len(df)} meses")
-            logger.info(f"  Total Usuários: {df['Usuários ativos'].sum():,.0f}".replace(',', '.'))
-            logger.info(f"  Total Sessões: {df['Sessões'].sum():,.0f}".replace(',', '.'))
-            logger.info(f"  Total Receita: R$ {df['Receita'].sum():,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
-        else:
-            logger.warning("⚠️  Nenhum dado encontrado para Bemol App")
-        
-        return df
-        
+
+        response = client.batch_run_reports(
+            request=BatchRunReportsRequest(
+                property=f"properties/{property_id}",
+                requests=[web_request, app_request]
+            )
+        )
+        web_report, app_report = response.reports
+
+        return _parse_web_report(web_report), _parse_app_report(app_report)
+
     except Exception as e:
-        logger.error(f"Erro ao coletar Bemol App: {str(e)}", exc_info=True)
-        return None
+        logger.error(f"Erro ao coletar Ecommerce Bemol (web+app): {str(e)}", exc_info=True)
+        return None, None
 
 # ============================================================================
 # FUNÇÕES DE COLETA - BEMOL FARMA
@@ -369,17 +464,6 @@ def fetch_bemol_farma_data(
     try:
         logger.info("🏥 Coletando dados: Bemol Farma - Tráfego Orgânico")
         
-        # Filtro para tráfego orgânico
-        organic_filter = FilterExpression(
-            filter=Filter(
-                field_name='sessionDefaultChannelGroup',
-                string_filter=Filter.StringFilter(
-                    match_type=Filter.StringFilter.MatchType.EXACT,
-                    value='Organic Search'
-                )
-            )
-        )
-        
         request = RunReportRequest(
             property=f"properties/{property_id}",
             dimensions=[
@@ -393,33 +477,40 @@ def fetch_bemol_farma_data(
                 Metric(name="totalRevenue")
             ],
             date_ranges=[DateRange(start_date=start_date, end_date=end_date)],
-            dimension_filter=organic_filter,
+            dimension_filter=_ORGANIC_FILTER,
             order_bys=[
                 OrderBy(dimension={'dimension_name': 'year'}),
                 OrderBy(dimension={'dimension_name': 'month'})
             ]
         )
         
-        response = client.run_report(request=request)
-        
-        data = []
-        for row in response.rows:
-            month = row.dimension_values[0].value
-            year = row.dimension_values[1].value
-            
-            # Taxa de engajamento vem como decimal (0.75 = 75%)
-            engagement_rate = float(row.metric_values[2].value) * 100
-            
-            data.append({
-                'Mês': month,
-                'Ano': year,
-                'Sessões orgânicas': int(row.metric_values[0].value),
-                'Usuários orgânicos': int(row.metric_values[1].value),
-                'Taxa de engajamento (%)': round(engagement_rate, 2),
-                'Receita orgânica': float(row.metric_values[3].value)
-            })
-        
-        df = pd.DataFrame(data)
+        # Construção colunar: listas por coluna e casts em bloco via astype
+        months, years, sessions, users, engagement, revenue = ([] for _ in range(6))
+        for row in _iter_report_rows(client, request):
+            dv, mv = row.dimension_values, row.metric_values
+            months.append(dv[0].value)
+            years.append(dv[1].value)
+            sessions.append(mv[0].value)
+            users.append(mv[1].value)
+            engagement.append(mv[2].value)
+            revenue.append(mv[3].value)
+
+        df = pd.DataFrame({
+            'Mês': months,
+            'Ano': years,
+            'Sessões orgânicas': sessions,
+            'Usuários orgânicos': users,
+            'Taxa de engajamento (%)': engagement,
+            'Receita orgânica': revenue
+        }).astype({
+            'Sessões orgânicas': int,
+            'Usuários orgânicos': int,
+            'Taxa de engajamento (%)': float,
+            'Receita orgânica': float
+        })
+
+        # Taxa de engajamento vem como decimal (0.75 = 75%)
+        df['Taxa de engajamento (%)'] = (df['Taxa de engajamento (%)'] * 100).round(2)
         
         if not df.empty:
             month_names = {
@@ -430,11 +521,16 @@ def fetch_bemol_farma_data(
             }
             df['Mês'] = df['Mês'].map(month_names)
             
+            # Totais e média em uma única passada sobre o DataFrame
+            totals = df.agg({
+                'Sessões orgânicas': 'sum', 'Usuários orgânicos': 'sum',
+                'Taxa de engajamento (%)': 'mean', 'Receita orgânica': 'sum'
+            })
             logger.info(f"✓ Coletados {len(df)} meses")
-            logger.info(f"  Total Sessões: {df['Sessões orgânicas'].sum():,.0f}".replace(',', '.'))
-            logger.info(f"  Total Usuários: {df['Usuários orgânicos'].sum():,.0f}".replace(',', '.'))
-            logger.info(f"  Engajamento médio: {df['Taxa de engajamento (%)'].mean():.2f}%")
-            logger.info(f"  Total Receita: R$ {df['Receita orgânica'].sum():,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
+            logger.info(f"  Total Sessões: {format_brl(totals['Sessões orgânicas'], 0)}")
+            logger.info(f"  Total Usuários: {format_brl(totals['Usuários orgânicos'], 0)}")
+            logger.info(f"  Engajamento médio: {totals['Taxa de engajamento (%)']:.2f}%")
+            logger.info(f"  Total Receita: R$ {format_brl(totals['Receita orgânica'])}")
         else:
             logger.warning("⚠️  Nenhum dado encontrado para Bemol Farma")
         
@@ -448,10 +544,43 @@ def fetch_bemol_farma_data(
 # EXPORTAÇÃO EXCEL (COM VALIDAÇÃO)
 # ============================================================================
 
+def compute_widths(df: pd.DataFrame) -> List[int]:
+    """
+    Larguras de coluna calculadas vetorialmente a partir do DataFrame
+    (redução em C via pandas, sem varrer célula a célula em Python)
+    """
+    return [
+        min(max(int(df[col].astype(str).str.len().max()), len(str(col))) + 2, 30)
+        for col in df.columns
+    ]
+
+# Versão do formato de exportação: entra no digest para que mudanças na
+# lógica do writer invalidem os arquivos em cache gerados pelo formato
+# anterior. Incremente ao alterar como o workbook é escrito
+_EXPORT_FORMAT_VERSION = 2
+
+# Limite de arquivos em ga4_reports/.cache — os mais antigos são removidos
+# após cada exportação para o cache não crescer sem fronteira
+_CACHE_MAX_FILES = 20
+
+def _frames_digest(valid_dfs: List[tuple]) -> str:
+    """
+    Hash do conteúdo dos DataFrames a exportar — usado como chave do cache
+    para pular a regeneração quando os dados não mudaram entre execuções
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(str(_EXPORT_FORMAT_VERSION).encode('ascii'))
+    for sheet_name, df in valid_dfs:
+        hasher.update(sheet_name.encode('utf-8'))
+        hasher.update(','.join(map(str, df.columns)).encode('utf-8'))
+        hasher.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return hasher.hexdigest()
+
 def export_to_excel(
     df_bemol_web: pd.DataFrame,
     df_bemol_app: pd.DataFrame,
-    df_bemol_farma: pd.DataFrame
+    df_bemol_farma: pd.DataFrame,
+    timestamp: str
 ) -> str:
     """Exporta todos os dados para Excel com 3 sheets"""
     try:
@@ -468,91 +597,149 @@ def export_to_excel(
             logger.error("❌ Nenhum dado para exportar!")
             return ""
         
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'GA4_Bemol_Complete_{Config.ANALYSIS_YEAR}_{timestamp}.xlsx'
-        filepath = os.path.join(Config.OUTPUT_DIR, filename)
-        
+        filepath = _OUTPUT_DIR / f'GA4_Bemol_Complete_{Config.ANALYSIS_YEAR}_{timestamp}.xlsx'
+
+        # Memoização por conteúdo: se os mesmos dados já foram exportados,
+        # reaproveita o arquivo do cache em vez de regenerar o workbook
+        digest = _frames_digest(valid_dfs)
+        cache_dir = _OUTPUT_DIR / '.cache'
+        cache_path = cache_dir / f'{digest}.xlsx'
+        if cache_path.exists():
+            # Renova o mtime no acerto para a poda se comportar como LRU
+            # (sem isso a entrada mais reaproveitada seria podada primeiro)
+            cache_path.touch()
+            shutil.copyfile(cache_path, filepath)
+            logger.info(f"♻️  Dados inalterados, Excel reaproveitado do cache: {filepath}")
+            return str(filepath)
+
         logger.info("📝 Gerando arquivo Excel...")
-        
-        with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
+
+        # xlsxwriter em modo constant_memory: as linhas são gravadas em
+        # streaming (≈1 linha residente) e a formatação é aplicada por
+        # coluna, sem reabrir o workbook para reformatar célula a célula
+        with pd.ExcelWriter(
+            filepath,
+            engine='xlsxwriter',
+            engine_kwargs={'options': {'constant_memory': True}}
+        ) as writer:
+            workbook = writer.book
+
+            # Formatos criados uma única vez e compartilhados entre sheets
+            header_fmt = workbook.add_format({
+                'bold': True, 'font_color': 'FFFFFF', 'bg_color': '4472C4',
+                'font_size': 11, 'align': 'center', 'valign': 'vcenter',
+                'border': 1
+            })
+            text_fmt = workbook.add_format({
+                'align': 'left', 'valign': 'vcenter', 'border': 1
+            })
+            int_fmt = workbook.add_format({
+                'num_format': '#,##0', 'align': 'right',
+                'valign': 'vcenter', 'border': 1
+            })
+            money_fmt = workbook.add_format({
+                'num_format': 'R$ #,##0.00', 'align': 'right',
+                'valign': 'vcenter', 'border': 1
+            })
+            pct_fmt = workbook.add_format({
+                'num_format': '0.00"%"', 'align': 'right',
+                'valign': 'vcenter', 'border': 1
+            })
+
             for sheet_name, df in valid_dfs:
-                df.to_excel(writer, sheet_name=sheet_name, index=False)
+                worksheet = workbook.add_worksheet(sheet_name)
+                writer.sheets[sheet_name] = worksheet
+
+                # Em constant_memory cada linha é descarregada assim que a
+                # seguinte começa, então set_column vem antes de qualquer
+                # escrita e as linhas entram inteiras, em ordem, via
+                # write_row (to_excel escreve coluna a coluna e perderia
+                # as células das linhas já descarregadas)
+                widths = compute_widths(df)
+                for col_idx, col_name in enumerate(df.columns):
+                    if col_name in ('Mês', 'Ano'):
+                        fmt = text_fmt
+                    elif 'Receita' in col_name:
+                        fmt = money_fmt
+                    elif '%' in col_name:
+                        fmt = pct_fmt
+                    else:
+                        fmt = int_fmt
+
+                    worksheet.set_column(col_idx, col_idx, widths[col_idx], fmt)
+
+                worksheet.write_row(0, 0, df.columns, header_fmt)
+                for row_idx, row in enumerate(
+                    df.itertuples(index=False, name=None), start=1
+                ):
+                    worksheet.write_row(row_idx, 0, row)
+
+                # Congelar primeira linha
+                worksheet.freeze_panes(1, 0)
                 logger.info(f"  ✓ Sheet: {sheet_name}")
-        
-        # Formatação
-        wb = load_workbook(filepath)
-        
-        # Cores e estilos
-        header_fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
-        header_font = Font(bold=True, color='FFFFFF', size=11)
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
+
+        # Alimenta o cache para execuções futuras com os mesmos dados e
+        # descarta os arquivos mais antigos além do limite
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(filepath, cache_path)
+        cached = sorted(
+            cache_dir.glob('*.xlsx'),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True
         )
-        
-        for sheet_name in wb.sheetnames:
-            ws = wb[sheet_name]
-            
-            # Formatar cabeçalho
-            for cell in ws[1]:
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-                cell.border = thin_border
-            
-            # Ajustar larguras
-            for col in ws.columns:
-                max_length = 0
-                col_letter = get_column_letter(col[0].column)
-                
-                for cell in col:
-                    try:
-                        if cell.value:
-                            max_length = max(max_length, len(str(cell.value)))
-                    except:
-                        pass
-                
-                adjusted_width = min(max_length + 2, 30)
-                ws.column_dimensions[col_letter].width = adjusted_width
-            
-            # Formatar células de dados
-            for row_idx, row in enumerate(ws.iter_rows(min_row=2, max_row=ws.max_row), start=2):
-                for col_idx, cell in enumerate(row, start=1):
-                    cell.border = thin_border
-                    cell.alignment = Alignment(horizontal='right', vertical='center')
-                    
-                    col_letter = get_column_letter(col_idx)
-                    
-                    # Mês e Ano - alinhar à esquerda
-                    if col_letter in ['A', 'B']:
-                        cell.alignment = Alignment(horizontal='left', vertical='center')
-                    
-                    # Números inteiros (sessões, usuários)
-                    elif cell.value and isinstance(cell.value, (int, float)) and 'Receita' not in str(ws[f'{col_letter}1'].value) and '%' not in str(ws[f'{col_letter}1'].value):
-                        cell.number_format = '#,##0'
-                    
-                    # Receita (moeda)
-                    elif cell.value and 'Receita' in str(ws[f'{col_letter}1'].value):
-                        cell.number_format = 'R$ #,##0.00'
-                    
-                    # Percentual
-                    elif cell.value and '%' in str(ws[f'{col_letter}1'].value):
-                        cell.number_format = '0.00"%"'
-            
-            # Congelar primeira linha
-            ws.freeze_panes = 'A2'
-        
-        wb.save(filepath)
-        
+        for stale in cached[_CACHE_MAX_FILES:]:
+            stale.unlink(missing_ok=True)
+
         logger.info(f"✅ Arquivo Excel criado: {filepath}")
-        return filepath
+        return str(filepath)
         
     except Exception as e:
         logger.error(f"Erro ao exportar Excel: {str(e)}", exc_info=True)
         return ""
 
+# ============================================================================
+# RESUMO FINAL
+# ============================================================================
+
+# Seções do resumo como tupla de módulo (alocada uma única vez):
+# (título, ((rótulo, coluna, agregação, formato), ...)) — formato 0 para
+# inteiro BR, 2 para moeda BR e '%' para percentual
+_SUMMARY_SECTIONS = (
+    ('🌐 BEMOL (WEB) - Ecommerce Bemol', (
+        ('Sessões Totais', 'Sessões totais (todos os canais)', 'sum', 0),
+        ('Receita Total', 'Receita total (todos os canais)', 'sum', 2),
+    )),
+    ('📱 BEMOL (APP) - Ecommerce Bemol', (
+        ('Usuários Ativos', 'Usuários ativos', 'sum', 0),
+        ('Sessões', 'Sessões', 'sum', 0),
+        ('Receita', 'Receita', 'sum', 2),
+    )),
+    ('🏥 BEMOL FARMA - Tráfego Orgânico', (
+        ('Sessões Orgânicas', 'Sessões orgânicas', 'sum', 0),
+        ('Usuários Orgânicos', 'Usuários orgânicos', 'sum', 0),
+        ('Taxa Engajamento Média', 'Taxa de engajamento (%)', 'mean', '%'),
+        ('Receita Orgânica', 'Receita orgânica', 'sum', 2),
+    )),
+)
+
+def _print_summary(title: str, df: Optional[pd.DataFrame], lines) -> None:
+    """Imprime uma seção do resumo final a partir da configuração acima"""
+    if df is None or df.empty:
+        return
+
+    # Agregados calculados em uma única passada pelo DataFrame
+    totals = df.agg({col: fn for _, col, fn, _ in lines})
+
+    print(f"\n{title}")
+    print(f"   Meses: {len(df)}")
+    for label, col, _, kind in lines:
+        if kind == '%':
+            print(f"   {label}: {totals[col]:.2f}%")
+        elif kind == 2:
+            print(f"   {label}: R$ {format_brl(totals[col])}")
+        else:
+            print(f"   {label}: {format_brl(totals[col], 0)}")
+
 # ============================================================================
 # MAIN
 # ============================================================================
@@ -585,33 +772,29 @@ def main():
         logger.info("INICIANDO COLETA DE DADOS")
         logger.info("="*80 + "\n")
         
-        # 1. Bemol (web) - da propriedade Ecommerce Bemol
-        df_bemol_web = fetch_bemol_web_data(
-            client,
-            Config.PROPERTIES['ecommerce_bemol'],
-            Config.ANALYSIS_START,
-            Config.ANALYSIS_END
-        )
-        
-        print()  # Espaço visual
-        
-        # 2. Bemol (App) - da propriedade Ecommerce Bemol
-        df_bemol_app = fetch_bemol_app_data(
-            client,
-            Config.PROPERTIES['ecommerce_bemol'],
-            Config.ANALYSIS_START,
-            Config.ANALYSIS_END
-        )
-        
-        print()  # Espaço visual
-        
-        # 3. Bemol Farma - da propriedade Bemol Farma
-        df_bemol_farma = fetch_bemol_farma_data(
-            client,
-            Config.PROPERTIES['bemol_farma'],
-            Config.ANALYSIS_START,
-            Config.ANALYSIS_END
-        )
+        # As coletas são independentes e limitadas pela latência da API:
+        # web+app saem em uma única RPC em lote (mesma propriedade) e a
+        # Farma em paralelo, então o tempo total cai para o da mais lenta
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            # 1-2. Bemol (web) + Bemol (App) - da propriedade Ecommerce Bemol
+            future_ecommerce = executor.submit(
+                fetch_ecommerce_data,
+                client,
+                Config.PROPERTIES['ecommerce_bemol'],
+                Config.ANALYSIS_START,
+                Config.ANALYSIS_END
+            )
+            # 3. Bemol Farma - da propriedade Bemol Farma
+            future_farma = executor.submit(
+                fetch_bemol_farma_data,
+                client,
+                Config.PROPERTIES['bemol_farma'],
+                Config.ANALYSIS_START,
+                Config.ANALYSIS_END
+            )
+
+            df_bemol_web, df_bemol_app = future_ecommerce.result()
+            df_bemol_farma = future_farma.result()
         
         # ====================================================================
         # EXPORTAÇÃO
@@ -621,7 +804,11 @@ def main():
         logger.info("EXPORTANDO RESULTADOS")
         logger.info("="*80 + "\n")
         
-        excel_path = export_to_excel(df_bemol_web, df_bemol_app, df_bemol_farma)
+        # Timestamp da execução calculado uma única vez e propagado
+        run_timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        excel_path = export_to_excel(
+            df_bemol_web, df_bemol_app, df_bemol_farma, run_timestamp
+        )
         
         if not excel_path:
             print("\n" + "="*80)
@@ -646,26 +833,9 @@ def main():
         print("\n📊 Resumo dos dados coletados:")
         print("-" * 80)
         
-        if df_bemol_web is not None and not df_bemol_web.empty:
-            print(f"\n🌐 BEMOL (WEB) - Ecommerce Bemol")
-            print(f"   Meses: {len(df_bemol_web)}")
-            print(f"   Sessões Totais: {df_bemol_web['Sessões totais (todos os canais)'].sum():,.0f}".replace(',', '.'))
-            print(f"   Receita Total: R$ {df_bemol_web['Receita total (todos os canais)'].sum():,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
-        
-        if df_bemol_app is not None and not df_bemol_app.empty:
-            print(f"\n📱 BEMOL (APP) - Ecommerce Bemol")
-            print(f"   Meses: {len(df_bemol_app)}")
-            print(f"   Usuários Ativos: {df_bemol_app['Usuários ativos'].sum():,.0f}".replace(',', '.'))
-            print(f"   Sessões: {df_bemol_app['Sessões'].sum():,.0f}".replace(',', '.'))
-            print(f"   Receita: R$ {df_bemol_app['Receita'].sum():,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
-        
-        if df_bemol_farma is not None and not df_bemol_farma.empty:
-            print(f"\n🏥 BEMOL FARMA - Tráfego Orgânico")
-            print(f"   Meses: {len(df_bemol_farma)}")
-            print(f"   Sessões Orgânicas: {df_bemol_farma['Sessões orgânicas'].sum():,.0f}".replace(',', '.'))
-            print(f"   Usuários Orgânicos: {df_bemol_farma['Usuários orgânicos'].sum():,.0f}".replace(',', '.'))
-            print(f"   Taxa Engajamento Média: {df_bemol_farma['Taxa de engajamento (%)'].mean():.2f}%")
-            print(f"   Receita Orgânica: R$ {df_bemol_farma['Receita orgânica'].sum():,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
+        frames = (df_bemol_web, df_bemol_app, df_bemol_farma)
+        for (title, lines), df in zip(_SUMMARY_SECTIONS, frames):
+            _print_summary(title, df, lines)
         
         print("\n" + "="*80 + "\n")
         
@@ -5,6 +5,7 @@ Verifica se tudo está configurado corretamente antes de executar a coleta
 
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 class Colors:
@@ -53,19 +54,30 @@ def check_file_exists(filename: str, description: str):
     
     return exists
 
+def try_import(import_name: str) -> bool:
+    """Tenta importar um módulo, retornando se está disponível"""
+    try:
+        __import__(import_name)
+        return True
+    except ImportError:
+        return False
+
 def check_package(package_name: str, import_name: str = None):
     """Verifica se pacote está instalado"""
     if import_name is None:
         import_name = package_name
-    
-    try:
-        __import__(import_name)
+
+    installed = try_import(import_name)
+    report_package(package_name, installed)
+    return installed
+
+def report_package(package_name: str, installed: bool):
+    """Imprime o resultado da verificação de um pacote"""
+    if installed:
         print(f"{Colors.GREEN}✓{Colors.RESET} {package_name}")
-        return True
-    except ImportError:
+    else:
         print(f"{Colors.RED}✗{Colors.RESET} {package_name}")
         print(f"  {Colors.YELLOW}Instale com: pip install {package_name}{Colors.RESET}")
-        return False
 
 def check_directory(dirname: str):
     """Verifica/cria diretório"""
@@ -113,10 +125,10 @@ def main():
         if filename == 'client_secret.json':
             all_ok = file_ok and all_ok
     
-    # Token pickle é opcional (criado na primeira execução)
-    token_exists = os.path.exists('token.pickle')
+    # Token é opcional (criado na primeira execução)
+    token_exists = os.path.exists('token.json')
     if token_exists:
-        print(f"{Colors.GREEN}✓{Colors.RESET} Token salvo: token.pickle (autenticação prévia)")
+        print(f"{Colors.GREEN}✓{Colors.RESET} Token salvo: token.json (autenticação prévia)")
     else:
         print(f"{Colors.YELLOW}ℹ{Colors.RESET} Token não encontrado (será criado na primeira execução)")
     
@@ -133,9 +145,15 @@ def main():
         ('openpyxl', 'openpyxl')
     ]
     
+    # Importações disparadas em paralelo: o lock de import serializa a
+    # execução dos módulos, mas as leituras de disco (.pyc) se sobrepõem
+    with ThreadPoolExecutor(max_workers=len(packages)) as executor:
+        results = list(executor.map(try_import, (name for _, name in packages)))
+
     packages_ok = True
-    for package, import_name in packages:
-        packages_ok = check_package(package, import_name) and packages_ok
+    for (package, _), installed in zip(packages, results):
+        report_package(package, installed)
+        packages_ok = installed and packages_ok
     
     all_ok = packages_ok and all_ok
     
@@ -189,7 +207,7 @@ def main():
         print("   1. Uma janela do navegador será aberta")
         print("   2. Faça login com sua conta Google")
         print("   3. Autorize o acesso ao Google Analytics")
-        print("   4. As credenciais serão salvas em token.pickle")
+        print("   4. As credenciais serão salvas em token.json")
         
     else:
         print(f"{Colors.RED}{Colors.BOLD}❌ ATENÇÃO: Alguns problemas foram encontrados{Colors.RESET}")